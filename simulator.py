@@ -1,13 +1,34 @@
+import io
+import threading
+from collections import deque
 import tkinter as tk
+from functools import lru_cache
 from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-from utils.qft import QFT
-from utils.iqft import IQFT
-from utils.phase_estimation import PhaseEstimation
-from qiskit.visualization import plot_bloch_multivector, plot_distribution, plot_state_city, plot_histogram
-from qiskit.quantum_info import state_fidelity
+import tkinter.font as tkfont
+
+_MAX_QUBITS = 10
+_FAST_PREVIEW_MAX_QUBITS = 4
+_PREVIEW_FONT = ("Courier", 10)
+_CIRCUIT_PREVIEW_DPI = 100
+# matches the dpi of qiskit's circuit drawer styles
+_CIRCUIT_SAVE_DPI = 150
+_MAX_DISTRIBUTION_BARS = 32
+_STATE_MAP = {"|0⟩": "0", "|1⟩": "1", "|+⟩": "+", "|−⟩": "-", "|i⟩": "r", "|−i⟩": "l"}
+_BASIS_STATES = list(_STATE_MAP)
+
+@lru_cache(maxsize=None)
+def _get_algorithm_class(algorithm):
+    # qiskit and qiskit-aer are slow to import, so load them on first build instead of at startup
+    if algorithm == "QFT":
+        from utils.qft import QFT
+        return QFT
+    if algorithm == "IQFT":
+        from utils.iqft import IQFT
+        return IQFT
+    if algorithm == "Phase Estimation":
+        from utils.phase_estimation import PhaseEstimation
+        return PhaseEstimation
+    raise ValueError(f"Unknown algorithm: {algorithm}")
 
 class QFTSimulator(tk.Tk):
     def __init__(self):
@@ -17,6 +38,13 @@ class QFTSimulator(tk.Tk):
         self.create_menu()
         self.create_layout()
         self.circuit_img = None
+        self.circuit_img_item = None
+        self.circuit_text_label = None
+        self.circuit_text_item = None
+        self.last_circuit_fig = None
+        self.fig_cache = {}
+        self.analysis_windows = {}
+        self.comparison_fig = None
         self.noise_type = None
         self.noise_params = None
         self.current_simulation = None
@@ -89,62 +117,56 @@ class QFTSimulator(tk.Tk):
         ttk.Button(left_frame, text="Set Qubit States", command=self.generate_qubit_states).pack(pady=20)
         self.state_selectors_frame = ttk.Frame(left_frame)
         self.state_selectors_frame.pack()
+        self.create_qubit_state_pool()
         ttk.Label(left_frame, text="Build and run", font=("Arial", 12, "bold")).pack(pady=5)
-        ttk.Button(left_frame, text="Build Quantum Circuit", command=self.build_circuit).pack(pady=10)
-        ttk.Button(left_frame, text="Run Simulation", command=self.run_simulation).pack(pady=10)
+        self.build_button = ttk.Button(left_frame, text="Build Quantum Circuit", command=self.build_circuit)
+        self.build_button.pack(pady=10)
+        self.run_button = ttk.Button(left_frame, text="Run Simulation", command=self.run_simulation)
+        self.run_button.pack(pady=10)
+
+    def create_qubit_state_pool(self):
+        self.qubit_state_vars = []
+        self.qubit_state_widgets = []
+        for i in range(_MAX_QUBITS):
+            label = tk.Label(self.state_selectors_frame, text=f"Qubit {i} state:")
+            state_var = tk.StringVar(value=_BASIS_STATES[0])
+            dropdown = tk.OptionMenu(self.state_selectors_frame, state_var, *_BASIS_STATES)
+            dropdown.config(width=4)
+            self.qubit_state_vars.append(state_var)
+            self.qubit_state_widgets.append((label, dropdown))
+        self.qubit_states = []
+        self.iqft_number_label = tk.Label(self.state_selectors_frame, text="Enter state number:")
+        self.iqft_number_entry = tk.Entry(self.state_selectors_frame, width=15, justify='center')
 
-    def generate_qubit_states(self):
+    def hide_state_selectors(self):
         for widget in self.state_selectors_frame.winfo_children():
-            widget.destroy()
+            widget.grid_remove()
+
+    def build_qubit_state_grid(self, n):
+        self.qubit_states = self.qubit_state_vars[:n]
+        for i, (label, dropdown) in enumerate(self.qubit_state_widgets[:n]):
+            self.qubit_state_vars[i].set(_BASIS_STATES[0])
+            label.grid(row=i, column=0, padx=5, pady=2)
+            dropdown.grid(row=i, column=1, padx=5, pady=2)
+
+    def generate_qubit_states(self):
+        self.hide_state_selectors()
 
         algorithm = self.algorithm_var.get()
-        if algorithm == "QFT":
-            try:
-                n = int(self.n_entry.get())
-                if n <= 0:
-                    raise ValueError
-            except ValueError:
-                tk.messagebox.showerror("Invalid Input", "Please enter a valid positive integer for number of qubits.")
-                return
-            self.qubit_states = []
-            basis_states = ["|0⟩", "|1⟩", "|+⟩", "|−⟩", "|i⟩", "|−i⟩"]
-            for i in range(n):
-                label = tk.Label(self.state_selectors_frame, text=f"Qubit {i} state:")
-                label.grid(row=i, column=0, padx=5, pady=2)
-
-                state_var = tk.StringVar()
-                state_var.set(basis_states[0])
-                dropdown = ttk.Combobox(self.state_selectors_frame, textvariable=state_var, values=basis_states, state="readonly", width=6)
-                dropdown.grid(row=i, column=1, padx=5, pady=2)
-
-                self.qubit_states.append(state_var)
-        elif algorithm == "IQFT":
-            label = tk.Label(self.state_selectors_frame, text="Enter state number:")
-            label.grid(row=0, column=0, padx=5, pady=2)
-            self.iqft_number_entry = tk.Entry(self.state_selectors_frame, width=15, justify='center')
+        if algorithm == "IQFT":
+            self.iqft_number_label.grid(row=0, column=0, padx=5, pady=2)
             self.iqft_number_entry.grid(row=0, column=1, padx=5, pady=2)
         elif algorithm == "Phase Estimation":
             return
         else:
             try:
                 n = int(self.n_entry.get())
-                if n <= 0:
+                if n <= 0 or n > _MAX_QUBITS:
                     raise ValueError
             except ValueError:
-                tk.messagebox.showerror("Invalid Input", "Please enter a valid positive integer for number of qubits.")
+                tk.messagebox.showerror("Invalid Input", f"Please enter an integer between 1 and {_MAX_QUBITS} for number of qubits.")
                 return
-            self.qubit_states = []
-            basis_states = ["|0⟩", "|1⟩", "|+⟩", "|−⟩", "|i⟩", "|−i⟩"]
-            for i in range(n):
-                label = tk.Label(self.state_selectors_frame, text=f"Qubit {i} state:")
-                label.grid(row=i, column=0, padx=5, pady=2)
-
-                state_var = tk.StringVar()
-                state_var.set(basis_states[0])
-                dropdown = ttk.Combobox(self.state_selectors_frame, textvariable=state_var, values=basis_states, state="readonly", width=6)
-                dropdown.grid(row=i, column=1, padx=5, pady=2)
-
-                self.qubit_states.append(state_var)
+            self.build_qubit_state_grid(n)
 
     def create_noise_panel(self):
         window = tk.Toplevel(self)
@@ -187,39 +209,78 @@ class QFTSimulator(tk.Tk):
     def create_bottom_panel(self, parent):
         bottom_frame = ttk.LabelFrame(parent, text="Simulation Output", padding=10)
         bottom_frame.pack(side=tk.BOTTOM, fill=tk.BOTH, expand=False, padx=10, pady=10)
-        self.output_text = tk.Text(bottom_frame, height=8, wrap=tk.WORD, font=("Courier", 11), relief=tk.FLAT)
+        self.output_text = tk.Text(bottom_frame, height=8, wrap=tk.WORD, font=("Courier", 11), relief=tk.FLAT, undo=False, autoseparators=False, maxundo=0)
         self.output_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         scrollbar = ttk.Scrollbar(bottom_frame, orient=tk.VERTICAL, command=self.output_text.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.output_text.config(yscrollcommand=scrollbar.set)
         self.output_text.config(state=tk.DISABLED)
+        self.log_buffer = deque()
+        self.log_flush_pending = False
 
     def add_text_to_bottom_panel(self, text):
+        self.log_buffer.append(str(text))
+        if not self.log_flush_pending:
+            self.log_flush_pending = True
+            self.after(50, self.flush_bottom_panel)
+
+    def flush_bottom_panel(self):
+        self.log_flush_pending = False
+        if not self.log_buffer:
+            return
+        lines = list(self.log_buffer)
+        self.log_buffer.clear()
         self.output_text.config(state=tk.NORMAL)
-        self.output_text.insert(tk.END, text)
-        self.output_text.insert(tk.END, "\n")
+        self.output_text.insert(tk.END, "\n".join(lines) + "\n")
         self.output_text.see(tk.END)
         self.output_text.config(state=tk.DISABLED)
 
     def clear_bottom_panel(self):
+        self.log_buffer.clear()
         self.output_text.config(state=tk.NORMAL)
         self.output_text.delete(1.0, tk.END)
         self.output_text.config(state=tk.DISABLED)
 
+    def open_analysis_window(self, kind, title, source):
+        # a figure can only belong to one canvas, so keep a single window per analysis kind
+        existing = self.analysis_windows.get(kind)
+        if existing is not None and existing[0].winfo_exists():
+            if existing[1] is source:
+                existing[0].lift()
+                return None
+            existing[0].destroy()
+        window = tk.Toplevel(self)
+        window.title(title)
+        window.geometry("800x600")
+        self.analysis_windows[kind] = (window, source)
+        return window
+
+    def cached_figure(self, state, kind, build):
+        key = (id(state), kind)
+        cached = self.fig_cache.get(key)
+        # keep the state alongside the figure so a recycled id() can't return a stale plot
+        if cached is not None and cached[0] is state:
+            return cached[1]
+        fig = build()
+        self.fig_cache[key] = (state, fig)
+        return fig
+
     def show_bloch_sphere_window(self):
         if self.current_simulation is None or self.current_simulation.get_resulting_state() is None:
             messagebox.showwarning("Warning", "No simulation results available. Run a simulation first.")
             return
         
-        window = tk.Toplevel(self)
-        window.title("Bloch Sphere Analysis")
-        window.geometry("800x600")
-
         state = self.current_simulation.get_resulting_state()
+        window = self.open_analysis_window('bloch', "Bloch Sphere Analysis", state)
+        if window is None:
+            return
         
         self.add_text_to_bottom_panel(state)
 
-        fig = plot_bloch_multivector(state, figsize=(8, 6), title='Bloch Spheres', reverse_bits=True)
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from qiskit.visualization import plot_bloch_multivector
+
+        fig = self.cached_figure(state, 'bloch', lambda: plot_bloch_multivector(state, figsize=(8, 6), title='Bloch Spheres', reverse_bits=True))
 
         canvas = FigureCanvasTkAgg(fig, master=window)
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -230,13 +291,17 @@ class QFTSimulator(tk.Tk):
             messagebox.showwarning("Warning", "No simulation results available. Run a simulation first.")
             return
         
-        window = tk.Toplevel(self)
-        window.title("Probability Analysis")
-        window.geometry("800x600")
+        state = self.current_simulation.get_resulting_state()
+        window = self.open_analysis_window('probability', "Probability Analysis", state)
+        if window is None:
+            return
 
         counts = self.current_simulation.get_resulting_counts()
 
-        fig = plot_distribution(counts, figsize=(8, 6), title='Probability Distribution')
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from qiskit.visualization import plot_distribution
+
+        fig = self.cached_figure(state, 'probability', lambda: plot_distribution(counts, number_to_keep=_MAX_DISTRIBUTION_BARS, figsize=(8, 6), title='Probability Distribution'))
 
         canvas = FigureCanvasTkAgg(fig, master=window)
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -247,13 +312,15 @@ class QFTSimulator(tk.Tk):
             messagebox.showwarning("Warning", "No simulation results available. Run a simulation first.")
             return
             
-        window = tk.Toplevel(self)
-        window.title("State City Analysis")
-        window.geometry("800x600")
-        
         counts = self.current_simulation.get_resulting_state()
+        window = self.open_analysis_window('city', "State City Analysis", counts)
+        if window is None:
+            return
+
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from qiskit.visualization import plot_state_city
 
-        fig = plot_state_city(counts, figsize=(8, 6), title='State City')
+        fig = self.cached_figure(counts, 'city', lambda: plot_state_city(counts, figsize=(8, 6), title='State City'))
 
         canvas = FigureCanvasTkAgg(fig, master=window)
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -264,22 +331,30 @@ class QFTSimulator(tk.Tk):
             messagebox.showwarning("Warning", "No simulation results available. Run a simulation first.")
             return
         
-        window = tk.Toplevel(self)
-        window.title("Fidelity Analysis")
-        window.geometry("800x600")
+        window = self.open_analysis_window('comparison', "Fidelity Analysis", self.current_simulation)
+        if window is None:
+            return
 
-        ideal_counts, noisy_counts = self.current_simulation.get_comp_counts()
-        ideal_fidelity, noisy_fidelity = self.current_simulation.get_comp_fidelity()
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        from qiskit.visualization import plot_histogram
 
-        fidelity = state_fidelity(ideal_fidelity, noisy_fidelity)
+        ideal_counts, noisy_counts = self.current_simulation.get_comp_counts()
+        fidelity = self.current_simulation.get_fidelity()
         self.add_text_to_bottom_panel(f"Fidelity: {fidelity:.4f}")
 
-        fig = Figure(figsize=(8, 6))
+        # created on first use rather than at startup so matplotlib stays a lazy import
+        if self.comparison_fig is None:
+            self.comparison_fig = Figure(figsize=(8, 6))
+            self.comparison_fig.set_layout_engine('none')
+        fig = self.comparison_fig
+        fig.clf()
         ax = fig.add_subplot(111)
 
         plot_histogram([ideal_counts, noisy_counts],
                     legend=['Ideal', 'Noisy'],
                     ax=ax,
+                    bar_labels=False,
                     title='Count Comparison')
 
         canvas = FigureCanvasTkAgg(fig, master=window)
@@ -292,43 +367,33 @@ class QFTSimulator(tk.Tk):
         
         try:
             n = int(n_str)
-            if n < 1 or n > 10:
-                raise ValueError("Number of qubits must be between 1 and 10")
+            if n < 1 or n > _MAX_QUBITS:
+                raise ValueError(f"Number of qubits must be between 1 and {_MAX_QUBITS}")
 
+            # small circuits get a text preview; the matplotlib drawing is only rendered when saving
+            fast_preview = n <= _FAST_PREVIEW_MAX_QUBITS
+            # fold to the canvas width rather than the width of the terminal that launched the app
+            fold, _ = self.circuit_text_capacity()
             algorithm = self.algorithm_var.get()
             if algorithm == "QFT":
-                state = ""
-                
-                for i in range(len(self.qubit_states)):
-                    temp = str(self.qubit_states[i].get())
-                    if temp == "|0⟩":
-                        state += "0"
-                    elif temp == "|1⟩":
-                        state += "1"
-                    elif temp == "|+⟩":
-                        state += "+"
-                    elif temp == "|−⟩":
-                        state += "-"
-                    elif temp == "|i⟩":
-                        state += "r"
-                    elif temp == "|−i⟩":
-                        state += "l"
-                    else:
-                        messagebox.showerror("Error", f"Invalid state for qubit {i+1}: {temp}")
-                        return
-                self.current_simulation = QFT(n=n, state=state, noise=self.noise_var.get(), noise_type=self.noise_type, noise_options=self.noise_params, measure=self.measure.get(), comparison=self.compare_var.get())
-                img_path = self.current_simulation.build_qft()
+                try:
+                    state = "".join(_STATE_MAP[state_var.get()] for state_var in self.qubit_states)
+                except KeyError as e:
+                    messagebox.showerror("Error", f"Invalid qubit state: {e.args[0]}")
+                    return
+                self.current_simulation = _get_algorithm_class(algorithm)(n=n, state=state, noise=self.noise_var.get(), noise_type=self.noise_type, noise_options=self.noise_params, measure=self.measure.get(), comparison=self.compare_var.get())
+                circuit_fig = self.current_simulation.build_qft(fast_preview=fast_preview, fold=fold)
             elif algorithm == "IQFT":
                 state = self.iqft_number_entry.get()
-                self.current_simulation = IQFT(n=n, state=state, noise=self.noise_var.get(), noise_type=self.noise_type, noise_options=self.noise_params, measure=self.measure.get(), comparison=self.compare_var.get())
-                img_path = self.current_simulation.build_iqft()
+                self.current_simulation = _get_algorithm_class(algorithm)(n=n, state=state, noise=self.noise_var.get(), noise_type=self.noise_type, noise_options=self.noise_params, measure=self.measure.get(), comparison=self.compare_var.get())
+                circuit_fig = self.current_simulation.build_iqft(fast_preview=fast_preview, fold=fold)
             elif algorithm == "Phase Estimation":
-                self.current_simulation = PhaseEstimation(n=n, state=None, noise=self.noise_var.get(), noise_type=self.noise_type, noise_options=self.noise_params, measure=self.measure.get(), comparison=self.compare_var.get())
-                img_path = self.current_simulation.build_phase_estimation()
+                self.current_simulation = _get_algorithm_class(algorithm)(n=n, state=None, noise=self.noise_var.get(), noise_type=self.noise_type, noise_options=self.noise_params, measure=self.measure.get(), comparison=self.compare_var.get())
+                circuit_fig = self.current_simulation.build_phase_estimation(fast_preview=fast_preview, fold=fold)
             else:
                 raise ValueError(f"Unknown algorithm: {algorithm}")
             
-            self.display_circuit(img_path)
+            self.display_circuit(circuit_fig)
             
             self.status_label.config(text=f"Circuit built with {n} qubits")
             
@@ -337,9 +402,49 @@ class QFTSimulator(tk.Tk):
         except Exception as e:
             messagebox.showerror("Error", f"Invalid input: {e}")
 
-    def display_circuit(self, img_path):
+    def circuit_text_capacity(self):
+        font = tkfont.Font(font=_PREVIEW_FONT)
+        canvas_width = self.circuit_canvas.winfo_width()
+        canvas_height = self.circuit_canvas.winfo_height()
+        if canvas_width <= 1 or canvas_height <= 1:
+            canvas_width, canvas_height = 600, 400
+        return (canvas_width - 40) // font.measure("0"), (canvas_height - 40) // font.metrics("linespace")
+
+    def display_circuit_text(self, text):
+        canvas_width = self.circuit_canvas.winfo_width()
+        canvas_height = self.circuit_canvas.winfo_height()
+        canvas_center_x = canvas_width // 2 if canvas_width > 1 else 200
+        canvas_center_y = canvas_height // 2 if canvas_height > 1 else 150
+
+        if self.circuit_text_item is None:
+            self.circuit_text_label = tk.Label(self.circuit_canvas, font=_PREVIEW_FONT, justify=tk.LEFT)
+            self.circuit_text_item = self.circuit_canvas.create_window(canvas_center_x, canvas_center_y, window=self.circuit_text_label, tags='circuit')
+        else:
+            self.circuit_canvas.coords(self.circuit_text_item, canvas_center_x, canvas_center_y)
+        self.circuit_text_label.config(text=text)
+        self.circuit_canvas.itemconfigure(self.circuit_text_item, state=tk.NORMAL)
+        if self.circuit_img_item is not None:
+            self.circuit_canvas.itemconfigure(self.circuit_img_item, state=tk.HIDDEN)
+        self.last_circuit_fig = None
+
+    def display_circuit(self, circuit_fig):
+        if isinstance(circuit_fig, str):
+            columns, rows = self.circuit_text_capacity()
+            lines = circuit_fig.splitlines()
+            if len(lines) <= rows and max(map(len, lines), default=0) <= columns:
+                self.display_circuit_text(circuit_fig)
+                return
+            # the text drawing would be clipped, so use the scaled image instead
+            circuit_fig = self.current_simulation.draw_circuit()
+
+        from PIL import Image, ImageTk
+
         try:
-            img = Image.open(img_path)
+            # crop to the tight bbox like qiskit's own savefig; the buffer stays in memory
+            buffer = io.BytesIO()
+            circuit_fig.savefig(buffer, format="png", dpi=_CIRCUIT_PREVIEW_DPI, bbox_inches="tight", facecolor=circuit_fig.get_facecolor())
+            buffer.seek(0)
+            img = Image.open(buffer)
             orig_width, orig_height = img.size
             
             canvas_width = self.circuit_canvas.winfo_width()
@@ -356,56 +461,92 @@ class QFTSimulator(tk.Tk):
                 new_width = int(orig_width * scale_factor)
                 new_height = int(orig_height * scale_factor)
                 
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                img = img.resize((new_width, new_height), Image.Resampling.BILINEAR)
             else:
-                img.thumbnail((600, 300), Image.Resampling.LANCZOS)
+                img.thumbnail((600, 300), Image.Resampling.BILINEAR)
             
             self.circuit_img = ImageTk.PhotoImage(img)
-            self.circuit_canvas.delete("all")
             
             canvas_center_x = canvas_width // 2 if canvas_width > 1 else 200
             canvas_center_y = canvas_height // 2 if canvas_height > 1 else 150
             
-            self.circuit_canvas.create_image(canvas_center_x, canvas_center_y, image=self.circuit_img)
-            self.last_img_path = img_path
+            if self.circuit_img_item is None:
+                self.circuit_img_item = self.circuit_canvas.create_image(canvas_center_x, canvas_center_y, image=self.circuit_img, tags='circuit')
+            else:
+                self.circuit_canvas.itemconfigure(self.circuit_img_item, image=self.circuit_img)
+                self.circuit_canvas.coords(self.circuit_img_item, canvas_center_x, canvas_center_y)
+            self.circuit_canvas.itemconfigure(self.circuit_img_item, state=tk.NORMAL)
+            if self.circuit_text_item is not None:
+                self.circuit_canvas.itemconfigure(self.circuit_text_item, state=tk.HIDDEN)
+            self.last_circuit_fig = circuit_fig
         except Exception as e:
             self.status_label.config(text=f"Error displaying circuit: {e}")
 
     def run_simulation(self):
+        if self.current_simulation is None:
+            messagebox.showwarning("Warning", "No circuit to simulate. Build a circuit first.")
+            return
         self.add_text_to_bottom_panel("Running simulation...")
-        try:
-            self.current_simulation.simulate()
+        self.status_label.config(text="Simulation running...")
+        # one run at a time, and no rebuilding the circuit underneath the worker
+        self.build_button.config(state=tk.DISABLED)
+        self.run_button.config(state=tk.DISABLED)
+        simulation = self.current_simulation
+        compare = self.compare_var.get()
+        measure = self.measure.get()
+
+        def worker():
+            try:
+                simulation.simulate()
+            except Exception as e:
+                self.after(0, self.on_simulation_failed, simulation, e)
+            else:
+                self.after(0, self.on_simulation_done, simulation, compare, measure)
+
+        threading.Thread(target=worker, daemon=True).start()
 
-            if self.compare_var.get():
-                self.analysis_menu.entryconfig("Comparison Analysis", state=tk.NORMAL)
-                self.analysis_menu.entryconfig("Bloch Sphere Analysis", state=tk.DISABLED)
+    def on_simulation_done(self, simulation, compare, measure):
+        self.build_button.config(state=tk.NORMAL)
+        self.run_button.config(state=tk.NORMAL)
+        if simulation is not self.current_simulation:
+            return
+        self.fig_cache.clear()
+        if compare:
+            self.analysis_menu.entryconfig("Comparison Analysis", state=tk.NORMAL)
+            self.analysis_menu.entryconfig("Bloch Sphere Analysis", state=tk.DISABLED)
+            self.analysis_menu.entryconfig("Probability Analysis", state=tk.DISABLED)
+            self.analysis_menu.entryconfig("State City Analysis", state=tk.DISABLED)
+        else:
+            self.analysis_menu.entryconfig("Bloch Sphere Analysis", state=tk.NORMAL)
+            if measure:
+                self.analysis_menu.entryconfig("Probability Analysis", state=tk.NORMAL)  
+                self.analysis_menu.entryconfig("State City Analysis", state=tk.NORMAL)
+            else:
                 self.analysis_menu.entryconfig("Probability Analysis", state=tk.DISABLED)
                 self.analysis_menu.entryconfig("State City Analysis", state=tk.DISABLED)
-            else:
-                self.analysis_menu.entryconfig("Bloch Sphere Analysis", state=tk.NORMAL)
-                if self.measure.get():
-                    self.analysis_menu.entryconfig("Probability Analysis", state=tk.NORMAL)  
-                    self.analysis_menu.entryconfig("State City Analysis", state=tk.NORMAL)
-                else:
-                    self.analysis_menu.entryconfig("Probability Analysis", state=tk.DISABLED)
-                    self.analysis_menu.entryconfig("State City Analysis", state=tk.DISABLED)
-                self.analysis_menu.entryconfig("Comparison Analysis", state=tk.DISABLED)
-            self.status_label.config(text="Simulation completed - Analysis menu enabled")
-            
-            self.add_text_to_bottom_panel("Simulation completed successfully")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Simulation failed: {e}")
+            self.analysis_menu.entryconfig("Comparison Analysis", state=tk.DISABLED)
+        self.status_label.config(text="Simulation completed - Analysis menu enabled")
+        
+        self.add_text_to_bottom_panel("Simulation completed successfully")
+
+    def on_simulation_failed(self, simulation, e):
+        self.build_button.config(state=tk.NORMAL)
+        self.run_button.config(state=tk.NORMAL)
+        if simulation is not self.current_simulation:
+            return
+        self.status_label.config(text="Simulation failed")
+        messagebox.showerror("Error", f"Simulation failed: {e}")
 
     def save_circuit(self):
-        if hasattr(self, 'last_img_path') and self.last_img_path:
+        if self.current_simulation is not None and self.current_simulation.get_circuit() is not None:
             filename = filedialog.asksaveasfilename(
                 defaultextension=".png",
                 filetypes=[("PNG files", "*.png"), ("All files", "*.*")]
             )
             if filename:
-                import shutil
-                shutil.copy(self.last_img_path, filename)
+                if self.last_circuit_fig is None:
+                    self.last_circuit_fig = self.current_simulation.draw_circuit()
+                self.last_circuit_fig.savefig(filename, dpi=_CIRCUIT_SAVE_DPI, bbox_inches="tight", facecolor=self.last_circuit_fig.get_facecolor())
                 messagebox.showinfo("Success", f"Circuit saved to {filename}")
         else:
             messagebox.showwarning("Warning", "No circuit to save. Build a circuit first.")
@@ -428,13 +569,14 @@ class QFTSimulator(tk.Tk):
         self.noise_var.set(False)
         self.noise_type_var.set("Bit flip")
         self.noise_params = None
-        self.state_selectors_frame.destroy()
+        self.hide_state_selectors()
 
     def reset_simulation(self):
         self.analysis_menu.entryconfig("Bloch Sphere Analysis", state=tk.DISABLED)
         self.analysis_menu.entryconfig("Probability Analysis", state=tk.DISABLED)
         self.analysis_menu.entryconfig("State City Analysis", state=tk.DISABLED)
         self.analysis_menu.entryconfig("Comparison Analysis", state=tk.DISABLED)
+        self.fig_cache.clear()
         self.clear_bottom_panel()
         self.status_label.config(text="Ready to build circuit")
 
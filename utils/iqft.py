@@ -1,12 +1,38 @@
 from qiskit import QuantumCircuit, transpile
 from qiskit.visualization import circuit_drawer
 from qiskit_aer import StatevectorSimulator, AerSimulator
-from qiskit_aer.noise import NoiseModel, depolarizing_error, amplitude_damping_error, phase_damping_error
-from qiskit.quantum_info import Kraus, Statevector, DensityMatrix
+from qiskit_aer.noise import NoiseModel, QuantumError, depolarizing_error, amplitude_damping_error, phase_damping_error
+from qiskit.quantum_info import state_fidelity, Kraus, Operator, Statevector, DensityMatrix
+from collections import OrderedDict
+import threading
 import numpy as np
-import tempfile
+
+_I2 = np.eye(2, dtype=np.complex64)
+_X = np.array([[0., 1.], [1., 0.]], dtype=np.complex64)
+_Z = np.array([[1., 0.], [0., -1.]], dtype=np.complex64)
+
+_ANALYTIC_NOISE_TYPES = ("Bit flip", "Phase flip", "Phase Damping", "Amplitude Damping")
+_ANALYTIC_NOISE_MAX_QUBITS = 6
+_SKIPPED_OPS = ("barrier", "save_density_matrix", "measure")
+
+def _apply_operator(rho, op, qubits, n):
+    k = len(qubits)
+    t = rho.reshape([2] * (2 * n))
+    op = op.reshape([2] * (2 * k))
+    # qiskit is little-endian: qubit q is tensor axis n-1-q, and the operator's leading axis is its last qarg
+    row_axes = [n - 1 - qubits[k - 1 - i] for i in range(k)]
+    col_axes = [n + axis for axis in row_axes]
+    t = np.tensordot(op, t, axes=(list(range(k, 2 * k)), row_axes))
+    t = np.moveaxis(t, list(range(k)), row_axes)
+    t = np.tensordot(op.conj(), t, axes=(list(range(k, 2 * k)), col_axes))
+    t = np.moveaxis(t, list(range(k)), col_axes)
+    return t.reshape(1 << n, 1 << n)
 
 class IQFT:
+    _TRANSPILE_CACHE: "OrderedDict[tuple, tuple[QuantumCircuit, QuantumCircuit]]" = OrderedDict()
+    _TRANSPILE_CACHE_SIZE = 16
+    _TRANSPILE_CACHE_LOCK = threading.Lock()
+
     def __init__(self, n=2, state=None, noise=False, noise_type=None, noise_options=None, measure=False, comparison=False):
         self.n = n
         self.state = state
@@ -17,33 +43,37 @@ class IQFT:
         self.resulting_state = None
         self.resulting_probabilities = None
         self.resulting_counts = None
+        self.counts_result = None
         self.measure = measure
         self.target = None
         self.comparison = comparison
         self.comp_fidelity = None
         self.comp_counts = None
+        self.fidelity = None
+        self._noise_model = None
+        self._noise_model_key = None
 
-    def build_iqft(self):
+    def build_iqft(self, fast_preview=False, fold=None):
         qc = QuantumCircuit(self.n)
         
         self.qc = self.add_iqft_circuit(qc)
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            circuit_drawer(qc, output="mpl", filename=tmp.name, style="iqx-standard")
-            img_path = tmp.name
-        return img_path
+        if fast_preview:
+            return qc.draw(output="text", fold=fold).single_string()
+        return self.draw_circuit()
+
+    def draw_circuit(self):
+        return circuit_drawer(self.qc, output="mpl", style="iqx-standard")
 
     def add_iqft_circuit(self, qc):
         for qubit in range(self.n):
             qc.h(qubit)
         
-        curr_num = 1
-        for qubit in reversed(range(self.n)):
-            qc.p(int(self.state) * np.pi/curr_num, qubit)
-            curr_num *= 2
+        angles = int(self.state) * np.pi / (1 << np.arange(self.n))
+        for qubit, angle in zip(reversed(range(self.n)), angles):
+            qc.p(float(angle), qubit)
         
         for qubit in range(self.n // 2):
             qc.swap(qubit, self.n - qubit - 1)
-            qc.barrier()
             
         def add_iqft_rotations(circuit, n):
             for target in range(n):
@@ -61,73 +91,147 @@ class IQFT:
             qc.measure_all()
         return qc
 
+    def _noise_key(self):
+        if not self.noise or not self.noise_options:
+            return None
+        return (self.noise_type, hash(frozenset(self.noise_options.items())))
+
+    def _transpile_cached(self, backend, backend_key):
+        key = (id(self.qc), backend_key, self._noise_key())
+        with self._TRANSPILE_CACHE_LOCK:
+            cached = self._TRANSPILE_CACHE.get(key)
+            # id() can be reused once a circuit is garbage collected, so keep the source circuit to compare against
+            if cached is not None and cached[0] is self.qc:
+                self._TRANSPILE_CACHE.move_to_end(key)
+                return cached[1]
+        # level 0 keeps every 'h' for the noise model and avoids swap elision permuting the saved states
+        circ = transpile(self.qc, backend, optimization_level=0)
+        with self._TRANSPILE_CACHE_LOCK:
+            self._TRANSPILE_CACHE[key] = (self.qc, circ)
+            if len(self._TRANSPILE_CACHE) > self._TRANSPILE_CACHE_SIZE:
+                self._TRANSPILE_CACHE.popitem(last=False)
+        return circ
+
+    def noise_param(self):
+        if self.noise_type is None or not self.noise_options:
+            return None
+        return self.noise_options.get(self.noise_type.lower().replace(' ', '_'))
+
+    def build_noise_model(self):
+        param = self.noise_param()
+        if param is None:
+            # noise enabled without applied settings runs with an empty model
+            return NoiseModel()
+        key = (self.noise_type, param)
+        if self._noise_model is not None and self._noise_model_key == key:
+            return self._noise_model
+        noise_model = NoiseModel()
+        error = self.noise_error(param)
+        if error is not None:
+            noise_model.add_all_qubit_quantum_error(error, ['h'])
+        self._noise_model = noise_model
+        self._noise_model_key = key
+        return noise_model
+
+    def noise_error(self, param):
+        if self.noise_type == "Depolarizing":
+            return depolarizing_error(param, 1)
+        if self.noise_type == "Amplitude Damping":
+            return amplitude_damping_error(param)
+        if self.noise_type == "Phase Damping":
+            return phase_damping_error(param)
+        if self.noise_type == "Bit flip":
+            s, t = np.float32(np.sqrt(param)), np.float32(np.sqrt(1 - param))
+            return QuantumError(Kraus([s * _I2, t * _X]))
+        if self.noise_type == "Phase flip":
+            s, t = np.float32(np.sqrt(param)), np.float32(np.sqrt(1 - param))
+            return QuantumError(Kraus([s * _I2, t * _Z]))
+        return None
+
+    def noise_kraus_ops(self):
+        # going through the qiskit error constructors rejects out-of-range parameters with NoiseError
+        error = self.noise_error(self.noise_param())
+        return [K.astype(np.complex64) for K in Kraus(error.to_quantumchannel()).data]
+
+    def use_analytic_noise(self):
+        return (self.noise and not self.measure and not self.comparison and self.noise_param() is not None
+                and self.noise_type in _ANALYTIC_NOISE_TYPES and self.n <= _ANALYTIC_NOISE_MAX_QUBITS)
+
+    def simulate_analytic_noise(self):
+        n = self.qc.num_qubits
+        kraus_ops = self.noise_kraus_ops()
+        rho = np.zeros((1 << n, 1 << n), dtype=np.complex64)
+        rho[0, 0] = 1
+        for instruction in self.qc.data:
+            operation = instruction.operation
+            if operation.name in _SKIPPED_OPS:
+                continue
+            qubits = [self.qc.find_bit(q).index for q in instruction.qubits]
+            rho = _apply_operator(rho, Operator(operation).data.astype(np.complex64), qubits, n)
+            if operation.name == 'h':
+                rho = sum(_apply_operator(rho, K, qubits, n) for K in kraus_ops)
+        return DensityMatrix(rho)
+
     def simulate(self):
+        # drop values derived from a previous run of the same circuit
+        self.resulting_probabilities = None
+        self.resulting_counts = None
+        self.counts_result = None
+        if self.use_analytic_noise():
+            self.target = AerSimulator(precision='single', noise_model=self.build_noise_model()).target
+            self.resulting_state = self.simulate_analytic_noise()
+            return
         noise_model = None
         if self.noise:
-            noise_model = NoiseModel()
-            if self.noise_type == "Depolarizing":
-                error = depolarizing_error(self.noise_options["depolarizing"], 1)
-                noise_model.add_all_qubit_quantum_error(error, ['h'])
-            elif self.noise_type == "Amplitude Damping":
-                error = amplitude_damping_error(self.noise_options["amplitude_damping"])
-                noise_model.add_all_qubit_quantum_error(error, ['h'])
-            elif self.noise_type == "Phase Damping":
-                error = phase_damping_error(self.noise_options["phase_damping"])
-                noise_model.add_all_qubit_quantum_error(error, ['h'])
-            elif self.noise_type == "Bit flip":
-                error = self.noise_options["bit_flip"]
-                K0 = np.sqrt(error) * np.eye(2)
-                K1 = np.sqrt(1 - error) * np.array([[0, 1], [1, 0]])
-                noise_ops = Kraus([K0, K1])
-                noise_model.add_all_qubit_quantum_error(noise_ops, ['h'])
-            elif self.noise_type == "Phase flip":
-                error = self.noise_options["phase_flip"]
-                K0 = np.sqrt(error) * np.eye(2)
-                K1 = np.sqrt(1 - error) * np.array([[1, 0], [0, -1]])
-                noise_ops = Kraus([K0, K1])
-                noise_model.add_all_qubit_quantum_error(noise_ops, ['h'])
+            noise_model = self.build_noise_model()
         if self.comparison:
             ideal = StatevectorSimulator(precision='single')
-            ideal_circ = transpile(self.qc, ideal)
+            ideal_circ = self._transpile_cached(ideal, "statevector_single")
             ideal_job = ideal.run(ideal_circ, shots=1024)
             ideal_result = ideal_job.result()
             ideal_state = Statevector(ideal_result.get_statevector(ideal_circ))
             ideal_counts = ideal_result.get_counts()
             noisy = AerSimulator(precision='single', noise_model=noise_model)
-            noisy_circ = transpile(self.qc, noisy)
+            noisy_circ = self._transpile_cached(noisy, "aer_single")
             noisy_job = noisy.run(noisy_circ, shots=1024)
             noisy_result = noisy_job.result()
             noisy_state = DensityMatrix(noisy_result.data(noisy_circ.name)['density_matrix'])
             noisy_counts = noisy_result.get_counts()
             self.comp_counts = (ideal_counts, noisy_counts)
             self.comp_fidelity = (ideal_state, noisy_state)
+            # single-precision results drift past the default validation tolerance
+            self.fidelity = state_fidelity(ideal_state, noisy_state, validate=False)
         else:
             if not self.noise:
                 statevector = StatevectorSimulator(precision='single')
-                circ = transpile(self.qc, statevector)
+                circ = self._transpile_cached(statevector, "statevector_single")
                 self.target = statevector.target
-                job = statevector.run(circ, shots=1024)
+                # only the saved statevector is read unless counts are requested
+                job = statevector.run(circ, shots=1024 if self.measure else 1)
                 self.resulting_state = Statevector(job.result().get_statevector(circ))
-                self.resulting_probabilities = self.resulting_state.probabilities()
                 if self.measure:
-                    self.resulting_counts = job.result().get_counts()
+                    self.counts_result = job.result()
             else:
                 aer = AerSimulator(precision='single', noise_model=noise_model)
-                circ = transpile(self.qc, aer)
+                circ = self._transpile_cached(aer, "aer_single")
                 self.target = aer.target
                 job = aer.run(circ, shots=1024)
                 result = job.result()
                 density_matrix = result.data(circ.name)['density_matrix']
                 self.resulting_state = DensityMatrix(density_matrix)
-                self.resulting_probabilities = self.resulting_state.probabilities()
                 if self.measure:
-                    self.resulting_counts = result.get_counts()
+                    self.counts_result = result
 
     def get_resulting_state(self):
         return self.resulting_state
     def get_resulting_probabilities(self):
+        # probabilities and counts are only derived when a view asks for them
+        if self.resulting_probabilities is None and self.resulting_state is not None:
+            self.resulting_probabilities = self.resulting_state.probabilities()
         return self.resulting_probabilities
     def get_resulting_counts(self):
+        if self.resulting_counts is None and self.counts_result is not None:
+            self.resulting_counts = self.counts_result.get_counts()
         return self.resulting_counts
     def get_circuit(self):
         return self.qc
@@ -135,5 +239,7 @@ class IQFT:
         return self.target
     def get_comp_fidelity(self):
         return self.comp_fidelity
+    def get_fidelity(self):
+        return self.fidelity
     def get_comp_counts(self):
         return self.comp_counts
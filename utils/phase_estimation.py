@@ -2,9 +2,8 @@ from qiskit import QuantumCircuit, transpile
 from qiskit.visualization import circuit_drawer
 from qiskit_aer import StatevectorSimulator, AerSimulator
 from qiskit_aer.noise import NoiseModel, depolarizing_error, amplitude_damping_error, phase_damping_error
-from qiskit.quantum_info import Kraus, Statevector, DensityMatrix
+from qiskit.quantum_info import state_fidelity, Kraus, Statevector, DensityMatrix
 import numpy as np
-import tempfile
 
 class PhaseEstimation:
     def __init__(self, n=2, state=None, noise=False, noise_type=None, noise_options=None, measure=False, comparison=False):
@@ -22,16 +21,19 @@ class PhaseEstimation:
         self.comparison = comparison
         self.comp_fidelity = None
         self.comp_counts = None
+        self.fidelity = None
 
-    def build_phase_estimation(self):
+    def build_phase_estimation(self, fast_preview=False, fold=None):
         qc = QuantumCircuit(self.n + 1)
         if self.state is not None:
             qc.initialize(self.state, range(self.n))
         self.qc = self.add_phase_estimation_circuit(qc)
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            circuit_drawer(qc, output="mpl", filename=tmp.name, style="iqx-standard")
-            img_path = tmp.name
-        return img_path
+        if fast_preview:
+            return qc.draw(output="text", fold=fold).single_string()
+        return self.draw_circuit()
+
+    def draw_circuit(self):
+        return circuit_drawer(self.qc, output="mpl", style="iqx-standard")
 
     def add_phase_estimation_circuit(self, qc):
         for i in range(self.n):
@@ -100,6 +102,8 @@ class PhaseEstimation:
             noisy_counts = noisy_result.get_counts()
             self.comp_counts = (ideal_counts, noisy_counts)
             self.comp_fidelity = (ideal_state, noisy_state)
+            # single-precision results drift past the default validation tolerance
+            self.fidelity = state_fidelity(ideal_state, noisy_state, validate=False)
         else:
             if not self.noise:
                 statevector = StatevectorSimulator(precision='single')
@@ -134,5 +138,7 @@ class PhaseEstimation:
         return self.target
     def get_comp_fidelity(self):
         return self.comp_fidelity
+    def get_fidelity(self):
+        return self.fidelity
     def get_comp_counts(self):
         return self.comp_counts
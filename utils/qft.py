@@ -2,10 +2,9 @@ from qiskit import QuantumCircuit, transpile
 from qiskit.visualization import circuit_drawer
 from qiskit_aer import StatevectorSimulator, AerSimulator
 from qiskit_aer.noise import NoiseModel, depolarizing_error, amplitude_damping_error, phase_damping_error
-from qiskit.quantum_info import Kraus, Statevector, DensityMatrix
+from qiskit.quantum_info import state_fidelity, Kraus, Statevector, DensityMatrix
 from qiskit.transpiler import Target
 import numpy as np
-import tempfile
 
 
 
@@ -25,8 +24,9 @@ class QFT:
         self.comparison = comparison
         self.comp_fidelity = None
         self.comp_counts = None
+        self.fidelity = None
 
-    def build_qft(self):
+    def build_qft(self, fast_preview=False, fold=None):
         qc = QuantumCircuit(self.n)
         
         if self.state is not None:
@@ -34,11 +34,12 @@ class QFT:
 
         self.qc = self.add_qft_circuit(qc)
         
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            circuit_drawer(qc, output="mpl", filename=tmp.name, style="iqx-standard")
-            img_path = tmp.name
+        if fast_preview:
+            return qc.draw(output="text", fold=fold).single_string()
+        return self.draw_circuit()
 
-        return img_path
+    def draw_circuit(self):
+        return circuit_drawer(self.qc, output="mpl", style="iqx-standard")
 
     def add_qft_circuit(self, qc):
         for i in range(self.n):
@@ -100,6 +101,8 @@ class QFT:
 
             self.comp_counts = (ideal_counts, noisy_counts)
             self.comp_fidelity = (ideal_state, noisy_state)
+            # single-precision results drift past the default validation tolerance
+            self.fidelity = state_fidelity(ideal_state, noisy_state, validate=False)
         else:
             if not self.noise:
                 statevector = StatevectorSimulator(precision='single')
@@ -140,5 +143,8 @@ class QFT:
     def get_comp_fidelity(self):
         return self.comp_fidelity
     
+    def get_fidelity(self):
+        return self.fidelity
+    
     def get_comp_counts(self):
         return self.comp_counts
\ No newline at end of file